@@ -1,16 +1,21 @@
 #!/usr/bin/env python3
+import io
 import os
 import re
+import json
+import shutil
+import asyncio
 import anitopy
-import subprocess
 import logging
-from typing import Optional, Tuple
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
-from pyrogram import Client, filters
+from dataclasses import dataclass
+from functools import lru_cache
+from contextlib import contextmanager
+from pyrogram import Client, filters, idle
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from dotenv import load_dotenv
-import requests
-from hashlib import md5
+from hashlib import blake2b
 import tempfile
 import time
 
@@ -32,87 +37,482 @@ API_HASH = os.getenv("API_HASH")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 MAX_FILE_SIZE = 4 * 1024 * 1024 * 1024  # 4GB
 
-# Initialize Pyrogram Client
+# Job files are short-lived, so each job goes to a RAM-backed tmpfs when it has room for
+# the download plus its muxed output (see reserve_job_dir), else to TEMP_DIR on disk.
+# Setting TMPDIR pins everything to that location instead.
+TMPFS_DIRS = ["/dev/shm"] + ([f"/run/user/{os.getuid()}"] if hasattr(os, "getuid") else [])
+TEMP_DIR = tempfile.gettempdir()
+TMPFS_CANDIDATES = [] if os.getenv("TMPDIR") else [p for p in TMPFS_DIRS if os.path.isdir(p)]
+tmpfs_capacity: Dict[str, int] = {}  # bytes each tmpfs can give to jobs, see measure_tmpfs
+tmpfs_reserved: Dict[str, int] = {p: 0 for p in TMPFS_CANDIDATES}  # bytes promised to in-flight jobs
+
+# Bound concurrent ffmpeg/mkvmerge runs so parallel jobs don't swamp the CPU
+PROCESS_SEMAPHORE = asyncio.Semaphore(os.cpu_count() or 1)
+
+# Download -> process -> upload pipeline; each stage overlaps with the others
+DOWNLOAD_WORKERS = 4
+PROCESS_WORKERS = 2
+UPLOAD_WORKERS = 4
+download_queue: asyncio.Queue = asyncio.Queue()
+# Bounded so finished downloads/outputs can't pile up on disk/tmpfs when a later stage lags
+process_queue: asyncio.Queue = asyncio.Queue(maxsize=PROCESS_WORKERS)
+upload_queue: asyncio.Queue = asyncio.Queue(maxsize=UPLOAD_WORKERS)
+
+# File-based extracts queued close together share one ffmpeg process
+EXTRACT_BATCH_WINDOW = 0.2
+EXTRACT_BATCH_SIZE = 8
+extract_queue: asyncio.Queue = asyncio.Queue()
+extract_tasks: set = set()
+
+# Sign-line detection for Dialogue fields
+STYLE_RE = re.compile(rb'sign|overlay|text|caption', re.IGNORECASE)
+ACTOR_RE = re.compile(rb'sign', re.IGNORECASE)
+EFFECT_RE = re.compile(rb'\\(?:an|pos|move|fad)')
+
+# Initialize Pyrogram Client; every download and upload worker gets its own transfer slot
+TRANSMISSIONS = max(DOWNLOAD_WORKERS, UPLOAD_WORKERS)
 app = Client(
     "anime_signer_bot",
     api_id=API_ID,
     api_hash=API_HASH,
-    bot_token=BOT_TOKEN
+    bot_token=BOT_TOKEN,
+    workers=16,
+    max_concurrent_transmissions=TRANSMISSIONS,
+    sleep_threshold=60
 )
 
-def extract_subtitles(input_path: str, output_path: str) -> bool:
+# Extra sessions of the same bot, so each file downloads over several connections
+DOWNLOAD_SESSIONS = 4
+STREAM_CHUNK = 1024 * 1024  # stream_media offsets/limits are in 1MB chunks
+UPLOAD_BUFFER = 8 * 1024 * 1024  # Pyrogram reads uploads in 512KB parts
+download_clients = [app] + [
+    Client(
+        f"anime_signer_worker_{i}",
+        api_id=API_ID,
+        api_hash=API_HASH,
+        bot_token=BOT_TOKEN,
+        no_updates=True,
+        max_concurrent_transmissions=TRANSMISSIONS,
+        sleep_threshold=60
+    )
+    for i in range(1, DOWNLOAD_SESSIONS)
+]
+
+async def run_command(*cmd: str, capture: bool = False, input: Optional[bytes] = None,
+                      pass_fds: Tuple[int, ...] = ()) -> Tuple[int, bytes, bytes]:
+    async with PROCESS_SEMAPHORE:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE if capture else asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            pass_fds=pass_fds
+        )
+        out, err = await proc.communicate(input)
+    return proc.returncode, out or b"", err
+
+async def probe_subtitles(input_path: str, head: Optional[bytes] = None) -> Optional[List[dict]]:
+    # List subtitle tracks; given the start of the file, ffprobe reads it from stdin instead
+    code, out, err = await run_command(
+        "ffprobe", "-v", "error", "-select_streams", "s",
+        "-show_entries", "stream=index,codec_name:stream_tags=title,language",
+        "-of", "json", "pipe:0" if head is not None else input_path,
+        capture=True, input=head
+    )
+    if code != 0:
+        logger.warning(f"FFprobe error: {err.decode(errors='replace')[:200]}...")
+        return None
     try:
-        subprocess.run([
-            "ffmpeg", "-y", "-i", input_path,
-            "-map", "0:s:0", "-c:s", "ass", output_path
-        ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return True
-    except subprocess.CalledProcessError as e:
-        logger.error(f"FFmpeg error: {e.stderr.decode()[:200]}...")
-        return False
+        return json.loads(out).get("streams", [])
+    except ValueError as e:
+        logger.warning(f"FFprobe output error: {e}")
+        return None
+
+def has_sign_track(streams: List[dict]) -> bool:
+    # An English (or untagged) track titled as signs
+    return any(
+        "sign" in s.get("tags", {}).get("title", "").lower()
+        and s.get("tags", {}).get("language", "") in ("", "eng", "und")
+        for s in streams
+    )
+
+def subtitle_codec(streams: Optional[List[dict]]) -> str:
+    # An ASS source track is byte-copied; anything else (or an unknown codec) is converted
+    return "copy" if streams and streams[0].get("codec_name") == "ass" else "ass"
+
+async def extract_one(input_path: str, codec: str = "ass") -> Optional[bytes]:
+    # Stream the first subtitle track as ASS over stdout instead of a temp file
+    code, out, err = await run_command(
+        "ffmpeg", "-v", "error", "-i", input_path,
+        "-map", "0:s:0", "-c:s", codec, "-f", "ass", "pipe:1",
+        capture=True
+    )
+    if code != 0:
+        logger.error(f"FFmpeg error: {err.decode(errors='replace')[:200]}...")
+        return None
+    return out
+
+def _resolve(future: asyncio.Future, result: Optional[bytes]):
+    if not future.done():
+        future.set_result(result)
+
+async def extract_batch(jobs: List[Tuple[str, str, asyncio.Future]]):
+    outputs = []
+    try:
+        if len(jobs) == 1:
+            path, codec, future = jobs[0]
+            _resolve(future, await extract_one(path, codec))
+            return
+
+        outputs = [temp_path(_file_key(path), "sub", ".ass") for path, _, _ in jobs]
+        cmd = ["ffmpeg", "-y", "-v", "error"]
+        for path, _, _ in jobs:
+            cmd += ["-i", path]
+        for i, ((_, codec, _), out_path) in enumerate(zip(jobs, outputs)):
+            cmd += ["-map", f"{i}:s:0", "-c:s", codec, out_path]
+        code, _, err = await run_command(*cmd)
+
+        if code == 0:
+            for (_, _, future), out_path in zip(jobs, outputs):
+                _resolve(future, await asyncio.to_thread(Path(out_path).read_bytes))
+        else:
+            # One bad input fails the whole run, so retry each job on its own, side by side
+            results = await asyncio.gather(*(extract_one(path, codec) for path, codec, _ in jobs))
+            for (_, _, future), result in zip(jobs, results):
+                _resolve(future, result)
+    except Exception as e:
+        logger.error(f"Batch extract error: {e}")
+    finally:
+        for _, _, future in jobs:
+            _resolve(future, None)
+        for out_path in outputs:
+            remove_file(out_path)
+
+async def extract_batcher():
+    loop = asyncio.get_running_loop()
+    while True:
+        jobs = [await extract_queue.get()]
+        deadline = loop.time() + EXTRACT_BATCH_WINDOW
+        while len(jobs) < EXTRACT_BATCH_SIZE:
+            try:
+                jobs.append(await asyncio.wait_for(extract_queue.get(), deadline - loop.time()))
+            except asyncio.TimeoutError:
+                break
+        # Batches run side by side; PROCESS_SEMAPHORE already bounds the ffmpeg processes
+        task = asyncio.create_task(extract_batch(jobs))
+        extract_tasks.add(task)
+        task.add_done_callback(extract_tasks.discard)
+
+async def extract_subtitles(input_path: str, codec: str = "ass") -> Optional[bytes]:
+    future = asyncio.get_running_loop().create_future()
+    await extract_queue.put((input_path, codec, future))
+    return await future
+
+async def download_and_extract(message: Message, dl_path: str) -> Tuple[Optional[List[dict]], Optional[bytes]]:
+    # Tee the download into ffmpeg so subtitles are extracted while the file is still
+    # arriving. This is paced by the network, so it doesn't take a PROCESS_SEMAPHORE slot.
+    file_size = (message.document or message.video).file_size
+    total = -(-file_size // STREAM_CHUNK)
+    per_client = -(-total // len(download_clients)) or 1
+    written = [asyncio.Event() for _ in range(total)]
+
+    fd = os.open(dl_path, os.O_RDWR)
+    os.ftruncate(fd, file_size)
+
+    async def fetch(client: Client, start: int, count: int):
+        # Each session downloads its own contiguous range of chunks
+        index = start
+        async for chunk in client.stream_media(message, offset=start, limit=count):
+            os.pwrite(fd, chunk, index * STREAM_CHUNK)
+            written[index].set()
+            index += 1
+        if index != start + count:
+            raise IOError(f"Download stopped at chunk {index} of {start + count}")
+
+    async def feed(proc: asyncio.subprocess.Process):
+        # ffmpeg needs the chunks in order, whichever session fetched them
+        try:
+            for index in range(total):
+                await written[index].wait()
+                proc.stdin.write(os.pread(fd, STREAM_CHUNK, index * STREAM_CHUNK))
+                await proc.stdin.drain()
+            proc.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg gave up early; the fetches carry on since the file is still needed for the mux
+            pass
+
+    async def extract() -> Tuple[Optional[List[dict]], Optional[bytes]]:
+        # The track list usually sits in the first chunk. Only a positive signs hit skips the
+        # stream: fonts attached ahead of the first Cluster can push the tracks past the head,
+        # and ffmpeg fails fast by itself if there really is no subtitle track
+        if total:
+            await written[0].wait()
+        streams = await probe_subtitles(dl_path, os.pread(fd, STREAM_CHUNK, 0))
+        if streams and has_sign_track(streams):
+            return streams, None
+
+        proc = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-v", "error", "-i", "pipe:0",
+            "-map", "0:s:0", "-c:s", subtitle_codec(streams), "-f", "ass", "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, out, err = await asyncio.gather(feed(proc), proc.stdout.read(), proc.stderr.read())
+        except BaseException:
+            try: proc.kill()
+            except ProcessLookupError: pass
+            await proc.wait()
+            raise
+        await proc.wait()
 
-def create_sign_subtitles(sub_path: str, output_path: str) -> bool:
+        if proc.returncode != 0:
+            # Inputs that can't be read from a pipe (e.g. MP4 with a trailing moov) are retried from disk
+            logger.warning(f"Streamed extract failed: {err.decode(errors='replace')[:200]}...")
+            return streams, None
+        return streams, out
+
+    fetches = [
+        asyncio.create_task(fetch(client, start, min(per_client, total - start)))
+        for client, start in zip(download_clients, range(0, total, per_client))
+    ]
+    extraction = asyncio.create_task(extract())
     try:
-        with open(sub_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        style_keywords = ["sign", "signs", "overlay", "text", "caption"]
-        effect_keywords = ["\\an", "\\pos", "\\move", "\\fad"]
-        actor_keywords = ["sign", "signs"]
-
-        filtered_lines = []
-        for line in content.split('\n'):
-            if line.startswith("Dialogue:"):
-                parts = line.split(',', 9)
-                if len(parts) >= 10:
-                    style, name, effect, text = parts[3].lower(), parts[4].lower(), parts[8], parts[9]
-                    if (any(kw in style for kw in style_keywords) or
-                        any(kw in name for kw in actor_keywords) or
-                        any(kw in effect or kw in text for kw in effect_keywords)):
-                        filtered_lines.append(line)
-            else:
-                filtered_lines.append(line)
-
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(filtered_lines))
+        await asyncio.gather(*fetches)
+        return await extraction
+    except BaseException:
+        for t in fetches + [extraction]:
+            t.cancel()
+        await asyncio.gather(*fetches, extraction, return_exceptions=True)
+        raise
+    finally:
+        os.close(fd)
+
+def _write_sign_subtitles(content: bytes, output_path: str) -> bool:
+    try:
+        # Write lines as they are matched rather than collecting and joining them;
+        # staying in bytes skips decoding and re-encoding the whole track
+        with open(output_path, 'wb') as out:
+            for line in io.BytesIO(content):
+                if line.startswith(b"Dialogue:"):
+                    parts = line.split(b',', 9)
+                    if len(parts) >= 10:
+                        style, name, effect, text = parts[3], parts[4], parts[8], parts[9]
+                        if (STYLE_RE.search(style) or ACTOR_RE.search(name) or
+                            EFFECT_RE.search(effect) or EFFECT_RE.search(text)):
+                            out.write(line)
+                else:
+                    out.write(line)
         return True
     except Exception as e:
         logger.error(f"Subtitle processing error: {e}")
         return False
 
-async def process_file(file_path: str, original_name: str) -> Tuple[Optional[str], str]:
-    try:
-        parsed = anitopy.parse(original_name)
-        anime_title = re.sub(r'[\[\]_]', ' ', parsed.get('anime_title', 'Unknown')).strip()
-        episode = parsed.get('episode_number', '')
-        lang = parsed.get('language', ['Jpn'])[0]
-        new_name = f"{anime_title} - {episode} [{lang}].mkv"
+async def create_sign_subtitles(content: bytes, output_path: str) -> bool:
+    # Filtering and file writes are blocking, keep them off the event loop
+    return await asyncio.to_thread(_write_sign_subtitles, content, output_path)
+
+@lru_cache(maxsize=1024)
+def _parse_name(file_name: str) -> Tuple[str, str, str]:
+    parsed = anitopy.parse(file_name)
+    anime_title = re.sub(r'[\[\]_]', ' ', parsed.get('anime_title', 'Unknown')).strip()
+    episode = parsed.get('episode_number', '')
+    lang = parsed.get('language', ['Jpn'])[0]
+    return anime_title, episode, lang
+
+@lru_cache(maxsize=1024)
+def _file_key(file_name: str) -> str:
+    return blake2b(file_name.encode(), digest_size=4).hexdigest()
+
+def temp_path(file_key: str, kind: str, suffix: str, directory: str = TEMP_DIR) -> str:
+    # Reserve a unique path; the sgn_ prefix lets sweep_temp_dir find orphans after a crash
+    with tempfile.NamedTemporaryFile(prefix=f"sgn_{kind}_{file_key}_", suffix=suffix,
+                                     dir=directory, delete=False) as tf:
+        return tf.name
 
-        temp_sub = os.path.join(tempfile.gettempdir(), f"temp_{md5(original_name.encode()).hexdigest()[:8]}.ass")
-        temp_sign = os.path.join(tempfile.gettempdir(), f"sign_{md5(original_name.encode()).hexdigest()[:8]}.ass")
-        output_path = os.path.join(tempfile.gettempdir(), new_name)
+def measure_tmpfs():
+    # Run after the startup sweep: whatever is free then is what jobs may use between them
+    for directory in TMPFS_CANDIDATES:
+        tmpfs_capacity[directory] = shutil.disk_usage(directory).free
 
-        if not extract_subtitles(file_path, temp_sub):
-            return None, new_name
+def reserve_job_dir(file_size: int) -> Tuple[str, int]:
+    # Reservations count against the startup capacity, so bytes jobs have already written
+    # aren't subtracted twice; live free space only caps it if other users grow meanwhile
+    need = 2 * file_size
+    for directory, capacity in tmpfs_capacity.items():
+        room = min(shutil.disk_usage(directory).free, capacity - tmpfs_reserved[directory])
+        if room >= need:
+            tmpfs_reserved[directory] += need
+            return directory, need
+    return TEMP_DIR, 0
 
-        if not create_sign_subtitles(temp_sub, temp_sign):
-            return None, new_name
+def release_job_dir(directory: Optional[str], reserved: int):
+    if directory in tmpfs_reserved:
+        tmpfs_reserved[directory] -= reserved
 
-        subprocess.run([
-            "mkvmerge", "-o", output_path,
-            "--language", "0:eng", "--track-name", "0:SignSub",
-            "--default-track", "0:yes", temp_sign,
-            file_path
-        ], check=True)
+@contextmanager
+def sign_track(file_key: str) -> Iterator[Tuple[str, Tuple[int, ...]]]:
+    # mkvmerge seeks while probing its inputs, so a pipe won't do; a memfd is seekable,
+    # never touches disk and is handed over as /dev/fd/N
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create(f"sgn_sign_{file_key}")
+        try:
+            yield f"/dev/fd/{fd}", (fd,)
+        finally:
+            os.close(fd)
+    else:
+        path = temp_path(file_key, "sign", ".ass")
+        try:
+            yield path, ()
+        finally:
+            remove_file(path)
 
-        for f in [temp_sub, temp_sign]:
-            try: os.remove(f)
-            except: pass
+def remove_file(path: Optional[str]):
+    if path and os.path.exists(path):
+        try: os.remove(path)
+        except OSError as e: logger.warning(f"Cleanup error: {e}")
 
-        return output_path, new_name
+def sweep_temp_dir(max_age: int = 3600):
+    for directory in {TEMP_DIR, *TMPFS_CANDIDATES}:
+        for p in Path(directory).glob("sgn_*"):
+            try:
+                if time.time() - p.stat().st_mtime > max_age:
+                    p.unlink()
+            except OSError as e:
+                logger.warning(f"Sweep error: {e}")
+
+async def process_file(file_path: str, new_name: str, file_key: str,
+                       streams: Optional[List[dict]] = None,
+                       content: Optional[bytes] = None) -> Optional[str]:
+    output_path = None
+    result = None
+    try:
+        if not streams:
+            # The head probe may have failed or missed a track list stored past the first chunk
+            streams = await probe_subtitles(file_path)
+        if streams is not None:
+            if not streams:
+                logger.info(f"No subtitle tracks in {new_name}")
+                return None
+            if has_sign_track(streams) and file_path.lower().endswith(".mkv"):
+                # Already carries a signs track; the source only needs its proper name on upload
+                logger.info(f"Signs track already present in {new_name}, skipping mux")
+                return file_path
+
+        if content is None:
+            content = await extract_subtitles(file_path, subtitle_codec(streams))
+        if content is None:
+            return None
+
+        # The download's directory already has room reserved for the output
+        output_path = temp_path(file_key, "out", ".mkv", os.path.dirname(file_path))
+        with sign_track(file_key) as (sign_path, sign_fds):
+            if not await create_sign_subtitles(content, sign_path):
+                return None
+
+            # Tag options apply to the source file that follows them; attachments (fonts) are kept
+            code, out, err = await run_command(
+                "mkvmerge", "-q", "-o", output_path,
+                "--language", "0:eng", "--track-name", "0:SignSub",
+                "--default-track", "0:yes", sign_path,
+                "--no-global-tags", "--no-track-tags", file_path,
+                capture=True, pass_fds=sign_fds
+            )
+
+        if code != 0:
+            # mkvmerge reports its errors on stdout
+            logger.error(f"mkvmerge error: {out.decode(errors='replace')[-200:]}")
+            return None
+
+        result = output_path
     except Exception as e:
         logger.error(f"Processing error: {e}")
-        return None, original_name
+    finally:
+        if result is None:
+            remove_file(output_path)
+    return result
+
+@dataclass
+class Job:
+    message: Message
+    status: Message
+    file_name: str
+    new_name: str
+    file_key: str
+    dl_path: Optional[str] = None
+    job_dir: Optional[str] = None
+    reserved: int = 0
+    streams: Optional[List[dict]] = None
+    subtitles: Optional[bytes] = None
+    output_path: Optional[str] = None
+
+def cleanup_job(job: Job):
+    remove_file(job.dl_path)
+    remove_file(job.output_path)
+    release_job_dir(job.job_dir, job.reserved)
+    job.reserved = 0
+
+async def with_status(status: Message, text: str, work: Awaitable):
+    # The status edit is an independent round-trip, so run it alongside the work
+    edit = asyncio.create_task(status.edit(text))
+    try:
+        return await work
+    finally:
+        # Cosmetic only: a failed edit must not discard the stage's result or mask its error
+        try: await edit
+        except Exception as e: logger.warning(f"Status update error: {e}")
+
+async def download_stage(job: Job):
+    # Space is reserved only once the download starts, not while the job waits in the queue
+    job.job_dir, job.reserved = reserve_job_dir((job.message.document or job.message.video).file_size)
+    job.dl_path = temp_path(job.file_key, "dl", os.path.splitext(job.file_name)[1], job.job_dir)
+    job.streams, job.subtitles = await with_status(
+        job.status, "⬇️ Downloading file...",
+        download_and_extract(job.message, job.dl_path)
+    )
+    await process_queue.put(job)
+
+async def process_stage(job: Job):
+    job.output_path = await with_status(
+        job.status, "🔄 Processing file...",
+        process_file(job.dl_path, job.new_name, job.file_key, job.streams, job.subtitles)
+    )
+
+    if not job.output_path:
+        await job.status.edit("❌ Processing failed")
+        cleanup_job(job)
+        return
+
+    # The muxed copy is all the upload needs; a skipped mux uploads the download itself
+    if job.output_path != job.dl_path:
+        remove_file(job.dl_path)
+        # Only the output's share of the reservation is still needed
+        release_job_dir(job.job_dir, job.reserved // 2)
+        job.reserved -= job.reserved // 2
+
+    await upload_queue.put(job)
+
+async def upload_stage(job: Job):
+    with open(job.output_path, 'rb', buffering=UPLOAD_BUFFER) as document:
+        await with_status(job.status, "📤 Uploading result...", job.message.reply_document(
+            document,
+            file_name=job.new_name,
+            caption=f"Processed: {job.new_name}"
+        ))
+    await job.status.delete()
+    cleanup_job(job)
+
+async def stage_worker(queue: asyncio.Queue, stage: Callable[[Job], Awaitable[None]]):
+    while True:
+        job = await queue.get()
+        try:
+            await stage(job)
+        except Exception as e:
+            logger.error(f"Handler error: {e}")
+            cleanup_job(job)
+            try: await job.message.reply("❌ An error occurred")
+            except Exception: pass
 
 @app.on_message(filters.document | filters.video)
 async def handle_file(client: Client, message: Message):
@@ -122,28 +522,11 @@ async def handle_file(client: Client, message: Message):
             return
 
         file_name = message.document.file_name if message.document else message.video.file_name
-        msg = await message.reply("⬇️ Downloading file...")
-        
-        dl_path = os.path.join(tempfile.gettempdir(), file_name)
-        await message.download(dl_path)
-        
-        await msg.edit("🔄 Processing file...")
-        output_path, new_name = await process_file(dl_path, file_name)
-        
-        if not output_path:
-            await msg.edit("❌ Processing failed")
-            return
+        anime_title, episode, lang = _parse_name(file_name)
+        new_name = f"{anime_title} - {episode} [{lang}].mkv"
+        msg = await message.reply("⏳ Queued...")
 
-        await msg.edit("📤 Uploading result...")
-        await message.reply_document(
-            output_path,
-            file_name=new_name,
-            caption=f"Processed: {new_name}"
-        )
-        await msg.delete()
-        
-        os.remove(dl_path)
-        os.remove(output_path)
+        await download_queue.put(Job(message, msg, file_name, new_name, _file_key(file_name)))
     except Exception as e:
         logger.error(f"Handler error: {e}")
         await message.reply("❌ An error occurred")
@@ -158,6 +541,28 @@ async def start(client: Client, message: Message):
         "Max size: 4GB | Formats: MKV/MP4"
     )
 
+async def main():
+    sweep_temp_dir()
+    measure_tmpfs()
+    async with app:
+        for client in download_clients[1:]:
+            await client.start()
+        workers = [
+            asyncio.create_task(stage_worker(queue, stage))
+            for queue, stage, count in (
+                (download_queue, download_stage, DOWNLOAD_WORKERS),
+                (process_queue, process_stage, PROCESS_WORKERS),
+                (upload_queue, upload_stage, UPLOAD_WORKERS),
+            )
+            for _ in range(count)
+        ]
+        workers.append(asyncio.create_task(extract_batcher()))
+        await idle()
+        for w in workers:
+            w.cancel()
+        for client in download_clients[1:]:
+            await client.stop()
+
 if __name__ == "__main__":
     logger.info("Starting bot...")
-    app.run()
+    app.run(main())